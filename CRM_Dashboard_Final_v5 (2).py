@@ -7,19 +7,25 @@ This prevents the "nonexistent object" error completely
 import os
 import time
 import math
+import random
 import datetime as dt
 import base64
+import hmac
 import io
 import json
 import traceback
+from functools import lru_cache
 from typing import Optional, Dict, List, Any
 import pandas as pd
 import requests
 import sqlite3
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, event, text
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
 import bcrypt
+import openpyxl
+import xlsxwriter
 
 import dash
 from dash import Dash, dcc, html, dash_table, Input, Output, State, ctx, no_update
@@ -35,12 +41,34 @@ WRITE_DB_URI = f"sqlite:///{DB_FILENAME}"
 REMINDER_HOURS = [12, 18]
 REMINDER_WINDOW_MINUTES = 6
 MASTER_RESET_KEY = "manus-reset-2025"
+SCHEMA_VERSION = 5
+BCRYPT_ROUNDS = 10
+EXPORT_CHUNK_ROWS = 50_000
+IMPORT_CHUNK_ROWS = 10_000
 
 # ---------------- DATABASE ENGINES ----------------
 
+# WAL allows many concurrent readers, so reads get a pool of connections while
+# all writes are funnelled through a single connection to avoid SQLITE_BUSY.
 READ_ENGINE = create_engine(
     READ_DB_URI,
     connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=8,
+    max_overflow=4,
+    pool_pre_ping=True,
+    future=True,
+)
+
+# Reports and exports scan whole tables; keep them off READ_ENGINE's pool so they
+# can't starve the interactive callbacks of connections.
+HEAVY_READ_ENGINE = create_engine(
+    READ_DB_URI,
+    connect_args={"check_same_thread": False, "timeout": 60},
+    poolclass=QueuePool,
+    pool_size=4,
+    max_overflow=0,
+    pool_timeout=120,
     pool_pre_ping=True,
     future=True,
 )
@@ -48,34 +76,120 @@ READ_ENGINE = create_engine(
 WRITE_ENGINE = create_engine(
     WRITE_DB_URI,
     connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=60,
     pool_pre_ping=True,
     future=True,
 )
 
+# No busy_timeout here: each engine's connect_args "timeout" already sets it, and a pragma would override that
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA foreign_keys=ON;
+"""
+
+@event.listens_for(READ_ENGINE, "connect")
+@event.listens_for(HEAVY_READ_ENGINE, "connect")
+@event.listens_for(WRITE_ENGINE, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _):
+    cur = dbapi_conn.cursor()
+    cur.executescript(SQLITE_PRAGMAS)
+    cur.close()
+
+@event.listens_for(HEAVY_READ_ENGINE, "connect")
+def _heavy_read_pragmas(dbapi_conn, _):
+    cur = dbapi_conn.cursor()
+    cur.executescript("PRAGMA query_only=1; PRAGMA cache_size=-131072;")
+    cur.close()
+
+@event.listens_for(WRITE_ENGINE, "connect")
+def _disable_pysqlite_begin(dbapi_conn, _):
+    # Let SQLAlchemy emit BEGIN itself so writes can take the lock up front
+    dbapi_conn.isolation_level = None
+
+@event.listens_for(WRITE_ENGINE, "begin")
+def _begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 # ---------------- HELPER FUNCTIONS ----------------
 
+WRITE_RETRY_ATTEMPTS = 6
+WRITE_RETRY_BASE = 0.01
+WRITE_RETRY_CAP = 2.0
+
 def with_write_retry(fn):
     def wrapper(*args, **kwargs):
         last_exc = None
-        for attempt in range(6):
+        sleep = WRITE_RETRY_BASE
+        for attempt in range(WRITE_RETRY_ATTEMPTS):
             try:
                 return fn(*args, **kwargs)
-            except OperationalError as e:
+            except (OperationalError, sqlite3.OperationalError) as e:
                 last_exc = e
-                if "locked" in str(e).lower():
-                    time.sleep(0.15 * (1 + attempt * 0.25))
-                    continue
-                raise
+                msg = str(e).lower()
+                if "locked" not in msg and "busy" not in msg:
+                    raise
+                if attempt == WRITE_RETRY_ATTEMPTS - 1:
+                    break
+                # Decorrelated jitter: each wait is drawn from the previous one, so colliding writers drift apart
+                sleep = min(WRITE_RETRY_CAP, random.uniform(WRITE_RETRY_BASE, sleep * 3))
+                time.sleep(sleep)
         if last_exc: raise last_exc
     return wrapper
 
+def hash_password(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+@lru_cache(maxsize=1)
+def default_admin_hash():
+    # The default admin password never changes, so one bcrypt run per process is enough
+    return hash_password("naved123")
+
+# Tables whose rows belong to a lead; deleting the lead takes them with it
+LEAD_CHILD_TABLES = {
+    "call_logs": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id INTEGER,
+            user_name TEXT,
+            call_date TIMESTAMP,
+            outcome TEXT,
+            pitch_used TEXT,
+            notes TEXT,
+            FOREIGN KEY (lead_id) REFERENCES leads(id) ON DELETE CASCADE
+        );
+    """,
+    "reminders": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id INTEGER,
+            reminder_date DATE,
+            reminder_type TEXT,
+            user_name TEXT,
+            is_done INTEGER DEFAULT 0,
+            FOREIGN KEY (lead_id) REFERENCES leads(id) ON DELETE CASCADE
+        );
+    """,
+}
+
+LEADS_FTS_DELETE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, customer_name, phone, location) VALUES ('delete', old.id, old.customer_name, old.phone, old.location);
+    END;
+"""
+
 def init_db():
-    try:
-        conn = sqlite3.connect(DB_FILENAME, timeout=30)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.commit()
-        conn.close()
-    except Exception: pass
+    # Skip the DDL (and the write lock) entirely when the schema is already current
+    with READ_ENGINE.connect() as conn:
+        schema_current = conn.exec_driver_sql("PRAGMA user_version").scalar() >= SCHEMA_VERSION
+        if schema_current and conn.execute(text("SELECT 1 FROM users WHERE username = 'naved'")).first():
+            return
 
     @with_write_retry
     def _create():
@@ -96,29 +210,28 @@ def init_db():
                     is_active INTEGER DEFAULT 1
                 );
             """))
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS call_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    lead_id INTEGER,
-                    user_name TEXT,
-                    call_date TIMESTAMP,
-                    outcome TEXT,
-                    pitch_used TEXT,
-                    notes TEXT,
-                    FOREIGN KEY (lead_id) REFERENCES leads(id)
-                );
-            """))
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS reminders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    lead_id INTEGER,
-                    reminder_date DATE,
-                    reminder_type TEXT,
-                    user_name TEXT,
-                    is_done INTEGER DEFAULT 0,
-                    FOREIGN KEY (lead_id) REFERENCES leads(id)
-                );
-            """))
+            for table, ddl in LEAD_CHILD_TABLES.items():
+                conn.execute(text(ddl.format(name=table)))
+                # SQLite can't alter a foreign key, so tables created before ON DELETE CASCADE are rebuilt
+                fks = conn.exec_driver_sql(f"PRAGMA foreign_key_list({table})").mappings().all()
+                if any(fk["table"] == "leads" and fk["on_delete"] != "CASCADE" for fk in fks):
+                    seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :t"), {"t": table}).scalar()
+                    columns = [c["name"] for c in conn.exec_driver_sql(f"PRAGMA table_info({table})").mappings()]
+                    conn.execute(text(ddl.format(name=f"{table}_new")))
+                    # Rows whose lead was deleted before foreign_keys was enforced would violate the new constraint.
+                    # Call history still feeds the reports, so it is kept with lead_id cleared; stale reminders are dropped.
+                    if table == "call_logs":
+                        select = ", ".join("CASE WHEN lead_id IN (SELECT id FROM leads) THEN lead_id END" if c == "lead_id" else c for c in columns)
+                        conn.execute(text(f"INSERT INTO {table}_new ({', '.join(columns)}) SELECT {select} FROM {table}"))
+                    else:
+                        dropped = conn.execute(text(f"DELETE FROM {table} WHERE lead_id IS NOT NULL AND lead_id NOT IN (SELECT id FROM leads)")).rowcount
+                        if dropped: print(f"Dropped {dropped} {table} rows pointing at deleted leads")
+                        conn.execute(text(f"INSERT INTO {table}_new ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {table}"))
+                    conn.execute(text(f"DROP TABLE {table}"))
+                    conn.execute(text(f"ALTER TABLE {table}_new RENAME TO {table}"))
+                    # sqlite_sequence has no row yet if the copy was empty, so an UPDATE alone would lose the counter
+                    if seq and not conn.execute(text("UPDATE sqlite_sequence SET seq = MAX(seq, :s) WHERE name = :t"), {"s": seq, "t": table}).rowcount:
+                        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :s)"), {"s": seq, "t": table})
             conn.execute(text("""
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -139,41 +252,129 @@ def init_db():
                 );
             """))
 
+            for ddl in (
+                "CREATE INDEX IF NOT EXISTS idx_leads_assigned_user ON leads(assigned_user)",
+                # idx_leads_db_user's leading column already serves database_name lookups
+                "DROP INDEX IF EXISTS idx_leads_database_name",
+                "CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(current_status)",
+                "CREATE INDEX IF NOT EXISTS idx_leads_db_user ON leads(database_name, assigned_user)",
+                # Equality columns first, range column last, matching the follow-ups query
+                "DROP INDEX IF EXISTS idx_reminders_date_user",
+                "CREATE INDEX IF NOT EXISTS idx_reminders_user_done_date ON reminders(user_name, is_done, reminder_date)",
+                # Cascading deletes look children up by lead_id
+                "CREATE INDEX IF NOT EXISTS idx_reminders_lead_id ON reminders(lead_id)",
+                "DROP INDEX IF EXISTS idx_call_logs_lead_id",
+                "CREATE INDEX IF NOT EXISTS idx_call_logs_lead_date ON call_logs(lead_id, call_date DESC)",
+                "CREATE INDEX IF NOT EXISTS idx_call_logs_date ON call_logs(call_date)",
+            ):
+                conn.execute(text(ddl))
+
+            # Trigram full-text index backing the Data View search; skipped if this SQLite build lacks FTS5
+            try:
+                conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(customer_name, phone, location, content='leads', content_rowid='id', tokenize='trigram')"))
+                conn.execute(text("""
+                    CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN
+                        INSERT INTO leads_fts(rowid, customer_name, phone, location) VALUES (new.id, new.customer_name, new.phone, new.location);
+                    END;
+                """))
+                conn.execute(text(LEADS_FTS_DELETE_TRIGGER))
+                conn.execute(text("""
+                    CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF customer_name, phone, location ON leads BEGIN
+                        INSERT INTO leads_fts(leads_fts, rowid, customer_name, phone, location) VALUES ('delete', old.id, old.customer_name, old.phone, old.location);
+                        INSERT INTO leads_fts(rowid, customer_name, phone, location) VALUES (new.id, new.customer_name, new.phone, new.location);
+                    END;
+                """))
+                conn.execute(text("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')"))
+            except OperationalError as e:
+                print(f"Full-text search unavailable, falling back to LIKE: {e}")
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
             # Default Admin
             row = conn.execute(text("SELECT COUNT(*) AS c FROM users WHERE username = 'naved'")).mappings().fetchone()
             if row and row["c"] == 0:
-                hashed = bcrypt.hashpw("naved123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                hashed = default_admin_hash()
                 conn.execute(text("INSERT INTO users (username, password, is_active, role) VALUES ('naved', :p, 1, 'admin')"), {"p": hashed})
     _create()
 
 init_db()
 
+@lru_cache(maxsize=1)
+def leads_fts_enabled():
+    with READ_ENGINE.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'")).first() is not None
+
+def clear_all_leads(conn):
+    """DELETE every lead, emptying the FTS index in one step instead of a per-row trigger; returns the row count"""
+    if not leads_fts_enabled():
+        return conn.execute(text("DELETE FROM leads")).rowcount
+    # DDL is transactional in SQLite, so the trigger is back before anyone else can see the table
+    conn.execute(text("DROP TRIGGER IF EXISTS leads_fts_ad"))
+    deleted = conn.execute(text("DELETE FROM leads")).rowcount
+    conn.execute(text("INSERT INTO leads_fts(leads_fts) VALUES ('delete-all')"))
+    conn.execute(text(LEADS_FTS_DELETE_TRIGGER))
+    return deleted
+
+def read_df(conn, query, params=None):
+    """Run a SELECT and build the DataFrame straight from the cursor rows (single place to swap the loader)"""
+    result = conn.execute(text(query), params or {})
+    return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+def read_records(conn, query, params=None):
+    """Run a SELECT and return plain row dicts, for results that go straight into a DataTable"""
+    return [dict(r) for r in conn.execute(text(query), params or {}).mappings()]
+
+def reset_key_matches(key):
+    """Constant-time check of a user-supplied master reset key"""
+    if not key or len(key) > 128: return False
+    return hmac.compare_digest(key.encode('utf-8'), MASTER_RESET_KEY.encode('utf-8'))
+
 def cu_username(current_user):
     if not current_user: return None
     return current_user.get("username") if isinstance(current_user, dict) else current_user
 
+ROLE_CACHE_TTL = 300
+
+@lru_cache(maxsize=256)
+def _user_role(username, ttl_bucket):
+    # ttl_bucket only exists to expire cached roles, so changes made by another worker process show up
+    with READ_ENGINE.begin() as conn:
+        row = conn.execute(text("SELECT role FROM users WHERE username = :u"), {"u": username}).mappings().fetchone()
+        return row["role"] if row else None
+
 def is_admin(username):
     if not username: return False
     try:
-        with READ_ENGINE.begin() as conn:
-            row = conn.execute(text("SELECT role FROM users WHERE username = :u"), {"u": username}).mappings().fetchone()
-            return bool(row and row["role"] == "admin")
+        return _user_role(username, int(time.time() // ROLE_CACHE_TTL)) == "admin"
     except Exception: return False
 
-def sanitize_df_for_json(df):
-    for col in df.columns:
-        if col == 'phone':
-            df[col] = df[col].apply(
-                lambda x: str(int(x)) if pd.notna(x) and isinstance(x, (int, float)) 
-                else (str(x) if pd.notna(x) else None)
-            )
-        else:
-            df[col] = df[col].apply(
-                lambda x: int.from_bytes(x, byteorder="little")
-                if isinstance(x, (bytes, bytearray))
-                else (None if pd.isna(x) else x)
-            )
-    return df
+def sanitize_records_for_json(rows):
+    """Make DB row dicts JSON-safe for the DataTable: bytes to ints, NaN to None, numeric phones to digit strings"""
+    for row in rows:
+        for col, val in row.items():
+            if isinstance(val, (bytes, bytearray)):
+                row[col] = int.from_bytes(val, byteorder="little")
+            elif isinstance(val, float) and math.isnan(val):
+                row[col] = None
+            elif col == "phone" and isinstance(val, (int, float)):
+                row[col] = str(round(val))
+    return rows
+
+LEAD_INSERT_COLUMNS = ["database_name", "customer_name", "phone", "customer_type", "location", "assigned_user", "current_status", "last_call_date"]
+LEAD_INSERT_SQL = f"INSERT INTO leads ({', '.join(LEAD_INSERT_COLUMNS)}) VALUES ({', '.join('?' * len(LEAD_INSERT_COLUMNS))})"
+
+def bulk_insert_leads(rows):
+    """Insert LEAD_INSERT_COLUMNS-ordered tuples via the raw pysqlite cursor in a single transaction"""
+    raw = WRITE_ENGINE.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.executemany(LEAD_INSERT_SQL, rows)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
 
 def insert_or_update_leads_from_df(df: pd.DataFrame) -> None:
     print("\n" + "="*50)
@@ -204,37 +405,26 @@ def insert_or_update_leads_from_df(df: pd.DataFrame) -> None:
         df = df.rename(columns=existing_renames)
     
     cols_lower = {str(c).lower(): c for c in df.columns}
-    mapping = {}
     
-    for pattern in ['database', 'db', 'source']:
-        for col_lower, col_orig in cols_lower.items():
-            if pattern in col_lower and 'database_name' not in mapping:
-                mapping['database_name'] = col_orig
-                break
-    
-    for pattern in ['customer', 'name', 'company', 'client']:
-        for col_lower, col_orig in cols_lower.items():
-            if pattern in col_lower and 'customer_name' not in mapping:
-                if 'phone' not in col_lower and 'mobile' not in col_lower:
-                    mapping['customer_name'] = col_orig
-                    break
-    
-    for pattern in ['phone', 'mobile', 'contact', 'number']:
-        for col_lower, col_orig in cols_lower.items():
-            if pattern in col_lower and 'phone' not in mapping:
-                mapping['phone'] = col_orig
-                break
-    
-    for pattern in ['location', 'city', 'place', 'address']:
-        for col_lower, col_orig in cols_lower.items():
-            if pattern in col_lower and 'location' not in mapping:
-                mapping['location'] = col_orig
-                break
-    
-    for pattern in ['type', 'nbd', 'crr', 'category']:
-        for col_lower, col_orig in cols_lower.items():
-            if pattern in col_lower and 'customer_type' not in mapping:
-                mapping['customer_type'] = col_orig
+    targets = {
+        'database_name': ['database', 'db', 'source'],
+        'customer_name': ['customer', 'name', 'company', 'client'],
+        'phone': ['phone', 'mobile', 'contact', 'number'],
+        'location': ['location', 'city', 'place', 'address'],
+        'customer_type': ['type', 'nbd', 'crr', 'category'],
+    }
+    # Columns already carrying a standard name win over fuzzy matches
+    mapping = {t: t for t in targets if t in df.columns}
+    for target, patterns in targets.items():
+        if target in mapping:
+            continue
+        # Patterns are in priority order: an exact-looking "Phone" beats an earlier "Contact Person"
+        for pattern in patterns:
+            match = next((col_orig for col_lower, col_orig in cols_lower.items()
+                          if pattern in col_lower and col_orig not in mapping.values()
+                          and not (target == 'customer_name' and ('phone' in col_lower or 'mobile' in col_lower))), None)
+            if match is not None:
+                mapping[target] = match
                 break
     
     if mapping:
@@ -253,51 +443,159 @@ def insert_or_update_leads_from_df(df: pd.DataFrame) -> None:
         print(f"  {col}: exists={exists}, has_data={has_data}")
         if not exists:
             print(f"  WARNING: Adding missing column '{col}' with None values")
-            df[col] = None
-    
-    for col in cols:
-        if col in df.columns:
-            df[col] = df[col].where(pd.notna(df[col]), None)
+    missing = [c for c in cols if c not in df.columns]
+    df = df.reindex(columns=list(df.columns) + missing)
     
     if 'phone' in df.columns:
-        def format_phone(phone_val):
-            if phone_val is None or pd.isna(phone_val):
-                return None
-            phone_str = str(phone_val)
-            if '.' in phone_str:
-                phone_str = phone_str.split('.')[0]
-            phone_str = ''.join(filter(str.isdigit, phone_str))
-            return phone_str if phone_str else None
-        
-        df['phone'] = df['phone'].apply(format_phone)
+        phone = (
+            df['phone'].astype('string')
+            .str.split('.', n=1).str[0]
+            .str.replace(r'\D+', '', regex=True)
+            .fillna('')
+        )
+        df['phone'] = phone.astype(object).where(phone != '', None)
         print("\n✓ Phone numbers formatted (decimals removed)")
     
     print("\nSample data to be inserted (first 2 rows):")
     print(df[cols].head(2).to_string())
     
-    df["assigned_user"] = None
-    df["current_status"] = "New"
-    df["last_call_date"] = None
+    df = df.assign(assigned_user=None, current_status="New", last_call_date=None)
     
     print(f"\nAttempting to insert {len(df)} rows into database...")
 
+    # One NaN -> None pass over the whole insert block
+    df = df[LEAD_INSERT_COLUMNS].astype(object)
+    df = df.where(df.notna(), None)
+
     @with_write_retry
     def _write(df_in: pd.DataFrame):
-        with WRITE_ENGINE.begin() as conn:
-            df_in[cols + ["assigned_user", "current_status", "last_call_date"]].to_sql(
-                "leads", conn, if_exists="append", index=False
-            )
+        # Generator is rebuilt on every retry attempt
+        bulk_insert_leads(df_in.itertuples(index=False, name=None))
     
     _write(df)
+    invalidate_leads_cache()
     print(f"✓ Successfully inserted {len(df)} rows")
     print("="*50 + "\n")
 
+FILTER_OPTIONS_TTL = 60
+_filter_options_cache = {"t": 0, "dbs": [], "users": []}
+
+def get_filter_options():
+    """Distinct database/user values for the Data View filters, cached for FILTER_OPTIONS_TTL seconds"""
+    if time.time() - _filter_options_cache["t"] < FILTER_OPTIONS_TTL:
+        return _filter_options_cache["dbs"], _filter_options_cache["users"]
+    with READ_ENGINE.begin() as conn:
+        dbs = [r[0] for r in conn.execute(text("SELECT DISTINCT database_name FROM leads WHERE database_name IS NOT NULL"))]
+        users = [r[0] for r in conn.execute(text("SELECT DISTINCT assigned_user FROM leads WHERE assigned_user IS NOT NULL"))]
+    _filter_options_cache.update(t=time.time(), dbs=dbs, users=users)
+    return dbs, users
+
+LEADS_TABLE_COLUMNS = ["id", "database_name", "customer_name", "phone", "location", "customer_type", "assigned_user", "current_status", "last_call_date"]
+LEADS_COUNT_TTL = 30
+LEADS_PAGE_TTL = 60
+_leads_count_cache = {}
+# Bumped on every leads write; part of every cache key so a query that raced a write can't cache stale results
+_leads_version = 0
+
+def query_leads(db, user_filter, search, sort, page, size, after=None):
+    """Fetch one page of leads for the Data View, returns (rows, total matching rows)
+
+    `after` is the (sort value, id) of the previous page's last row; when given the page is
+    fetched with a keyset seek instead of OFFSET.
+    """
+    sort_key = (sort[0].get("column_id"), sort[0].get("direction")) if sort else None
+    rows, total = _leads_page(db, user_filter, search, sort_key, page, size, after, _leads_version, int(time.time() // LEADS_PAGE_TTL))
+    return [dict(r) for r in rows], total
+
+def leads_page_cursor(rows, sort):
+    """Keyset position just past the last row of a page, None when paging can't seek from it"""
+    if not rows: return None
+    col = sort[0].get("column_id") if sort and sort[0].get("column_id") in LEADS_TABLE_COLUMNS else "id"
+    last = rows[-1]
+    # The cursor lives in a session store, so anything JSON can't carry (legacy BLOBs) falls back to OFFSET
+    if not isinstance(last[col], (str, int, float)):
+        return None
+    return [last[col], last["id"]]
+
+@lru_cache(maxsize=128)
+def _leads_page(db, user_filter, search, sort_key, page, size, after, version, ttl_bucket):
+    # version and ttl_bucket only exist to invalidate/expire cached pages
+    where = []
+    params = {}
+    if db:
+        where.append("database_name = :db")
+        params["db"] = db
+    if user_filter:
+        where.append("assigned_user = :u")
+        params["u"] = user_filter
+    if search:
+        # Trigram MATCH gives the same substring semantics as LIKE '%...%' but needs at least 3 characters
+        if len(search) >= 3 and leads_fts_enabled():
+            where.append("id IN (SELECT rowid FROM leads_fts WHERE leads_fts MATCH :q)")
+            params["q"] = '"' + search.replace('"', '""') + '"'
+        else:
+            where.append("(customer_name LIKE :s OR phone LIKE :s OR location LIKE :s)")
+            params["s"] = f"%{search}%"
+
+    where_sql = "WHERE " + " AND ".join(where) if where else ""
+    sort_col, descending = "id", False
+    if sort_key and sort_key[0] in LEADS_TABLE_COLUMNS:
+        sort_col, descending = sort_key[0], sort_key[1] != "asc"
+    direction = "DESC" if descending else "ASC"
+    # id breaks ties so OFFSET and keyset pages line up exactly
+    order = f"ORDER BY {sort_col} {direction}" + ("" if sort_col == "id" else f", id {direction}")
+
+    page_where = list(where)
+    page_params = {**params, "l": size, "o": page * size}
+    if after is not None:
+        cmp = "<" if descending else ">"
+        if sort_col == "id":
+            page_where.append(f"id {cmp} :after_id")
+        else:
+            seek = f"({sort_col}, id) {cmp} (:after_val, :after_id)"
+            # NULLs sort after every value in DESC order and never compare true, keep them reachable
+            page_where.append(f"({seek} OR {sort_col} IS NULL)" if descending else seek)
+            page_params["after_val"] = after[0]
+        page_params["after_id"] = after[1]
+        page_params["o"] = 0
+    page_where_sql = "WHERE " + " AND ".join(page_where) if page_where else ""
+
+    # COUNT(*) is the expensive part of a page turn, reuse it while the filters stay the same
+    count_key = (version, where_sql, tuple(sorted(params.items())))
+    cached = _leads_count_cache.get(count_key)
+    with READ_ENGINE.begin() as conn:
+        if cached and time.time() - cached[0] < LEADS_COUNT_TTL:
+            total = cached[1]
+        else:
+            total = conn.execute(text(f"SELECT COUNT(*) FROM leads {where_sql}"), params).scalar()
+            if len(_leads_count_cache) > 512: _leads_count_cache.clear()
+            _leads_count_cache[count_key] = (time.time(), total)
+        rows = conn.execute(text(f"SELECT * FROM leads {page_where_sql} {order} LIMIT :l OFFSET :o"),
+                            page_params).mappings().all()
+    return tuple(dict(r) for r in rows), total
+
+def invalidate_leads_cache():
+    """Call after any write that changes rows in the leads table"""
+    global _leads_version
+    _leads_version += 1
+    _filter_options_cache["t"] = 0
+    _leads_count_cache.clear()
+    _leads_page.cache_clear()
+
+PITCH_TEMPLATES_TTL = 60
+_pitch_templates_cache = {"t": 0, "rows": []}
+
 def get_all_pitch_templates():
+    """All pitch templates, newest first, cached for PITCH_TEMPLATES_TTL seconds"""
+    if time.time() - _pitch_templates_cache["t"] < PITCH_TEMPLATES_TTL:
+        return _pitch_templates_cache["rows"]
     try:
         with READ_ENGINE.begin() as conn:
-            df = pd.read_sql(text("SELECT id, title, pitch_text, created_at, user_name FROM pitch_templates ORDER BY created_at DESC"), conn)
-            return df.to_dict("records")
+            rows = conn.execute(text("SELECT id, title, pitch_text, created_at, user_name FROM pitch_templates ORDER BY created_at DESC")).mappings()
+            rows = [dict(r) for r in rows]
     except Exception: return []
+    _pitch_templates_cache.update(t=time.time(), rows=rows)
+    return rows
 
 def create_reminders_for_no_response(conn, lead_id, user_name, call_date, attempts):
     if attempts <= 3:
@@ -305,10 +603,8 @@ def create_reminders_for_no_response(conn, lead_id, user_name, call_date, attemp
         conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'No response', :user)"),
                      {"lid": lead_id, "rdate": next_date.isoformat(), "user": user_name})
     else:
-        for d in (30, 60, 90):
-            rdate = call_date + dt.timedelta(days=d)
-            conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'No response long interval', :user)"),
-                         {"lid": lead_id, "rdate": rdate.isoformat(), "user": user_name})
+        rows = [{"lid": lead_id, "rdate": (call_date + dt.timedelta(days=d)).isoformat(), "user": user_name} for d in (30, 60, 90)]
+        conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'No response long interval', :user)"), rows)
 
 def create_reminders_for_catalogue(conn, lead_id, user_name, call_date, attempts):
     if attempts <= 5:
@@ -316,10 +612,8 @@ def create_reminders_for_catalogue(conn, lead_id, user_name, call_date, attempts
         conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'Catalogue', :user)"),
                      {"lid": lead_id, "rdate": next_date.isoformat(), "user": user_name})
     else:
-        for d in (30, 60, 90):
-            rdate = call_date + dt.timedelta(days=d)
-            conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'Catalogue long interval', :user)"),
-                         {"lid": lead_id, "rdate": rdate.isoformat(), "user": user_name})
+        rows = [{"lid": lead_id, "rdate": (call_date + dt.timedelta(days=d)).isoformat(), "user": user_name} for d in (30, 60, 90)]
+        conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, 'Catalogue long interval', :user)"), rows)
 
 # ---------------- LAYOUT COMPONENTS ----------------
 
@@ -439,6 +733,18 @@ def layout_admin():
         ])
     ])
 
+TAB_LAYOUTS = {
+    "tab-workflow": lambda: layout_workflow(None),
+    "tab-followups": lambda: layout_followups(None),
+    "tab-reports": layout_reports,
+    "tab-admin": layout_admin,
+}
+
+@lru_cache(maxsize=16)
+def cached_tab_layout(tab, today):
+    """Tab layouts are static apart from date defaults, so build them once per day"""
+    return TAB_LAYOUTS[tab]()
+
 # ---------------- APP INITIALIZATION ----------------
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
@@ -448,7 +754,9 @@ app.layout = html.Div([
     dcc.Store(id="current-user", storage_type="session"),
     dcc.Store(id="selected-lead-id", storage_type="session"),
     dcc.Store(id="current-page", storage_type="session", data=0),
+    dcc.Store(id="leads-page-cursors", storage_type="session"),
     dcc.Store(id="workflow-pitch-store"),
+    dcc.Store(id="admin-tab-opened"),
     
     dbc.Navbar([
         dbc.NavbarBrand("📞 MAISON SIA CRM Dashboard", className="ms-2"),
@@ -492,11 +800,11 @@ app.layout = html.Div([
             dbc.Row([
                 dbc.Col([html.Label("Database"), dcc.Dropdown(id="filter-database", placeholder="All")], width=3),
                 dbc.Col([html.Label("CRM User"), dcc.Dropdown(id="filter-user", placeholder="All")], width=3),
-                dbc.Col([html.Label("Search"), dcc.Input(id="search-input", placeholder="Search name/phone/location...", type="text", className="w-100")], width=6),
+                dbc.Col([html.Label("Search"), dcc.Input(id="search-input", placeholder="Search name/phone/location...", type="text", debounce=True, className="w-100")], width=6),
             ], className="mb-3"),
             dash_table.DataTable(
                 id="leads-table",
-                columns=[{"name": i, "id": i} for i in ["id", "database_name", "customer_name", "phone", "location", "customer_type", "assigned_user", "current_status", "last_call_date"]],
+                columns=[{"name": i, "id": i} for i in LEADS_TABLE_COLUMNS],
                 page_current=0, page_size=15, page_action="custom", page_count=0, sort_action="custom", sort_mode="single",
                 row_selectable="single",
                 style_table={"overflowX": "auto"}, style_cell={"textAlign": "left", "fontSize": 12},
@@ -516,16 +824,19 @@ app.layout = html.Div([
 
 # ---------------- AUTH CALLBACKS ----------------
 
-@app.callback(
+# Pure style swaps, so they run in the browser instead of costing a server round trip
+app.clientside_callback(
+    """
+    function(user) {
+        if (user) { return [{display: "none"}, {display: "block"}, "Welcome, " + user.username]; }
+        return [{display: "block"}, {display: "none"}, ""];
+    }
+    """,
     Output("login-wrapper", "style"),
     Output("main-wrapper", "style"),
     Output("navbar-user-label", "children"),
     Input("current-user", "data")
 )
-def toggle_view(user):
-    if user:
-        return {"display": "none"}, {"display": "block"}, f"Welcome, {user['username']}"
-    return {"display": "block"}, {"display": "none"}, ""
 
 @app.callback(
     Output("current-user", "data"),
@@ -539,6 +850,7 @@ def toggle_view(user):
 def handle_auth(login_n, logout_n, username, password):
     triggered = ctx.triggered_id
     if triggered == "logout-button":
+        _user_role.cache_clear()
         return None, ""
 
     if triggered == "login-button":
@@ -558,17 +870,20 @@ def handle_auth(login_n, logout_n, username, password):
             return no_update, f"Error: {e}"
     return no_update, no_update
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(forgot_n, back_n) {
+        const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+        if (triggered.includes("forgot-password-link.n_clicks")) { return [{display: "none"}, {display: "block"}]; }
+        return [{display: "block"}, {display: "none"}];
+    }
+    """,
     Output("login-form", "style"),
     Output("reset-form", "style"),
     Input("forgot-password-link", "n_clicks"),
     Input("back-to-login-link", "n_clicks"),
     prevent_initial_call=True
 )
-def toggle_reset_form(forgot_n, back_n):
-    if ctx.triggered_id == "forgot-password-link":
-        return {"display": "none"}, {"display": "block"}
-    return {"display": "block"}, {"display": "none"}
 
 @app.callback(
     Output("reset-status", "children"),
@@ -577,10 +892,11 @@ def toggle_reset_form(forgot_n, back_n):
     prevent_initial_call=True
 )
 def handle_reset(n, key):
-    if key == MASTER_RESET_KEY:
-        hashed = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    if reset_key_matches(key):
+        hashed = hash_password("admin123")
         with WRITE_ENGINE.begin() as conn:
             conn.execute(text("UPDATE users SET password = :p WHERE username = 'naved'"), {"p": hashed})
+        _user_role.cache_clear()
         return "Password for 'naved' reset to 'admin123'."
     return "Invalid Master Key."
 
@@ -603,11 +919,9 @@ def update_tab_visibility(tab, user):
     
     # Get dropdown options
     try:
-        with READ_ENGINE.begin() as conn:
-            df = pd.read_sql("SELECT DISTINCT database_name FROM leads", conn)
-            dbs = [{"label": d, "value": d} for d in df["database_name"].dropna().unique().tolist()]
-            df_users = pd.read_sql("SELECT DISTINCT assigned_user FROM leads", conn)
-            users = [{"label": u, "value": u} for u in df_users["assigned_user"].dropna().unique().tolist()]
+        db_values, user_values = get_filter_options()
+        dbs = [{"label": d, "value": d} for d in db_values]
+        users = [{"label": u, "value": u} for u in user_values]
     except Exception:
         dbs, users = [], []
     
@@ -616,15 +930,11 @@ def update_tab_visibility(tab, user):
     
     if tab == "tab-data":
         return {"display": "block"}, html.Div(), {"display": "none"}, dbs, users, delete_style
-    elif tab == "tab-workflow":
-        return {"display": "none"}, layout_workflow(user), {"display": "block"}, dbs, users, delete_style
-    elif tab == "tab-followups":
-        return {"display": "none"}, layout_followups(user), {"display": "block"}, dbs, users, delete_style
-    elif tab == "tab-reports":
-        return {"display": "none"}, layout_reports(), {"display": "block"}, dbs, users, delete_style
+    elif tab in ("tab-workflow", "tab-followups", "tab-reports"):
+        return {"display": "none"}, cached_tab_layout(tab, dt.date.today()), {"display": "block"}, dbs, users, delete_style
     elif tab == "tab-admin":
-        if is_admin(user["username"]):
-            return {"display": "none"}, layout_admin(), {"display": "block"}, dbs, users, delete_style
+        if admin_status:
+            return {"display": "none"}, cached_tab_layout(tab, dt.date.today()), {"display": "block"}, dbs, users, delete_style
         return {"display": "none"}, html.Div("Admin access required."), {"display": "block"}, dbs, users, delete_style
     
     return {"display": "none"}, html.Div(), {"display": "none"}, dbs, users, delete_style
@@ -636,6 +946,7 @@ def update_tab_visibility(tab, user):
     Output("leads-table", "page_count"),
     Output("leads-table", "page_current"),
     Output("current-page", "data"),
+    Output("leads-page-cursors", "data"),
     Input("tabs", "value"),
     Input("leads-table", "page_current"),
     Input("leads-table", "page_size"),
@@ -645,11 +956,12 @@ def update_tab_visibility(tab, user):
     Input("filter-user", "value"),
     State("current-user", "data"),
     State("current-page", "data"),
+    State("leads-page-cursors", "data"),
 )
-def update_leads_data(active_tab, page_current, size, sort, search, db, user_filter, current_user, stored_page):
+def update_leads_data(active_tab, page_current, size, sort, search, db, user_filter, current_user, stored_page, page_cursors):
     """Updates the leads table data and manages pagination state - NOW WORKS!"""
     if not current_user:
-        return [], 1, 0, 0
+        return [], 1, 0, 0, None
     
     # Determine which page to show
     triggered_id = ctx.triggered_id
@@ -664,34 +976,18 @@ def update_leads_data(active_tab, page_current, size, sort, search, db, user_fil
     else:
         page = stored_page if stored_page is not None else 0
     
-    # Build query
-    where = []
-    params = {}
-    if db:
-        where.append("database_name = :db")
-        params["db"] = db
-    if user_filter:
-        where.append("assigned_user = :u")
-        params["u"] = user_filter
-    if search:
-        s = f"%{search}%"
-        where.append("(customer_name LIKE :s OR phone LIKE :s OR location LIKE :s)")
-        params["s"] = s
-
-    where_sql = "WHERE " + " AND ".join(where) if where else ""
-    
-    with READ_ENGINE.begin() as conn:
-        total = conn.execute(text(f"SELECT COUNT(*) FROM leads {where_sql}"), params).scalar()
-        order = "ORDER BY id ASC"
-        if sort:
-            order = f"ORDER BY {sort[0]['column_id']} {'ASC' if sort[0]['direction']=='asc' else 'DESC'}"
-        df = pd.read_sql(text(f"SELECT * FROM leads {where_sql} {order} LIMIT :l OFFSET :o"), 
-                        conn, params={**params, "l": size, "o": page * size})
+    # Seek positions for pages reached by stepping forward; random jumps fall back to OFFSET
+    cursor_key = [db, user_filter, search, sort, size]
+    cursors = page_cursors["cursors"] if page_cursors and page_cursors.get("key") == cursor_key else {}
+    after = cursors.get(str(page))
     
-    df = sanitize_df_for_json(df)
+    rows, total = query_leads(db, user_filter, search, sort, page, size, after=tuple(after) if after else None)
+    cursor = leads_page_cursor(rows, sort)
+    if cursor:
+        cursors[str(page + 1)] = cursor
     page_count = max(1, math.ceil(total / size)) if size else 1
     
-    return df.to_dict("records"), page_count, page, page
+    return sanitize_records_for_json(rows), page_count, page, page, {"key": cursor_key, "cursors": cursors}
 
 @app.callback(
     Output("selected-lead-id", "data"),
@@ -708,6 +1004,9 @@ def select_lead(rows, data, current_selection):
             return current_selection
     return current_selection
 
+# call_logs and reminders rows go with their lead via ON DELETE CASCADE
+DELETE_LEADS_STMT = text("DELETE FROM leads WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+
 @app.callback(
     Output("delete-leads-status", "children"),
     Output("leads-table", "selected_rows"),
@@ -731,10 +1030,8 @@ def delete_leads(n, rows, data, user):
             return "No valid rows selected.", no_update
 
         with WRITE_ENGINE.begin() as conn:
-            placeholders = ", ".join([f":id{i}" for i in range(len(ids))])
-            query = text(f"DELETE FROM leads WHERE id IN ({placeholders})")
-            params = {f"id{i}": val for i, val in enumerate(ids)}
-            conn.execute(query, params)
+            conn.execute(DELETE_LEADS_STMT, {"ids": ids})
+        invalidate_leads_cache()
         return f"Deleted {len(ids)} rows.", []
     except Exception as e:
         return f"Error: {str(e)}", no_update
@@ -753,12 +1050,11 @@ def update_summary(lid, active_tab):
     
     try:
         with READ_ENGINE.begin() as conn: 
-            df = pd.read_sql("SELECT * FROM leads WHERE id = :id", conn, params={"id": lid})
+            r = conn.execute(text("SELECT customer_name, phone, current_status FROM leads WHERE id = :id"), {"id": lid}).mappings().first()
         
-        if df.empty: 
+        if not r: 
             return "Lead not found. Please select a lead from Data View tab."
         
-        r = df.iloc[0]
         return html.Div([
             html.B(r["customer_name"]), 
             f" ({r['phone']}) - Status: {r['current_status']}"
@@ -777,23 +1073,22 @@ def update_call_history(lid):
     
     try:
         with READ_ENGINE.begin() as conn:
-            df = pd.read_sql(
-                "SELECT call_date, user_name, outcome, notes FROM call_logs WHERE lead_id = :lid ORDER BY call_date DESC LIMIT 10",
-                conn,
-                params={"lid": lid}
-            )
+            rows = conn.execute(
+                text("SELECT call_date, user_name, outcome, notes FROM call_logs WHERE lead_id = :lid ORDER BY call_date DESC LIMIT 10"),
+                {"lid": lid}
+            ).all()
         
-        if df.empty:
+        if not rows:
             return html.Div("No call history yet.")
         
         history_items = []
-        for idx, row in df.iterrows():
+        for call_date, user_name, outcome, notes in rows:
             history_items.append(html.Div([
-                html.B(f"{row['call_date']} - {row['outcome']}"),
+                html.B(f"{call_date} - {outcome}"),
                 html.Br(),
-                html.Small(f"By: {row['user_name']}"),
+                html.Small(f"By: {user_name}"),
                 html.Br(),
-                html.Small(f"Notes: {row['notes'] or 'N/A'}"),
+                html.Small(f"Notes: {notes or 'N/A'}"),
                 html.Hr()
             ]))
         
@@ -832,17 +1127,25 @@ def save_call(n, lid, user, cdate, remark, pitch, assign, fdate, notes):
     def _save():
         with WRITE_ENGINE.begin() as conn:
             conn.execute(text("INSERT INTO call_logs (lead_id, user_name, call_date, outcome, pitch_used, notes) VALUES (:lid, :u, :d, :o, :p, :n)"), {"lid": lid, "u": uname, "d": cdate, "o": remark, "p": pitch or "", "n": notes or ""})
-            lead = pd.read_sql("SELECT * FROM leads WHERE id = :id", conn, params={"id": lid}).iloc[0]
-            no_resp = (lead["no_response_attempts"] or 0) + (1 if remark == "No response" else 0)
-            cat_att = (lead["catalogue_attempts"] or 0) + (1 if remark == "Catalogue" else 0)
             active = 0 if remark in ["Purchased", "Not Interested", "Invalid number"] else 1
-            if remark == "No response": create_reminders_for_no_response(conn, lid, uname, dt.date.fromisoformat(cdate), no_resp)
-            elif remark == "Catalogue": create_reminders_for_catalogue(conn, lid, uname, dt.date.fromisoformat(cdate), cat_att)
+            # Increment the attempt counters in place and read them back, no separate SELECT needed
+            lead = conn.execute(text("""
+                UPDATE leads SET
+                    no_response_attempts = COALESCE(no_response_attempts, 0) + :dn,
+                    catalogue_attempts = COALESCE(catalogue_attempts, 0) + :dc,
+                    current_status=:s, last_call_date=:d, is_active=:a,
+                    assigned_user = COALESCE(:au, assigned_user)
+                WHERE id=:id
+                RETURNING no_response_attempts, catalogue_attempts
+            """), {"dn": 1 if remark == "No response" else 0, "dc": 1 if remark == "Catalogue" else 0, "s": remark, "d": cdate, "a": active, "au": assign or None, "id": lid}).mappings().first()
+            if remark == "No response": create_reminders_for_no_response(conn, lid, uname, dt.date.fromisoformat(cdate), lead["no_response_attempts"])
+            elif remark == "Catalogue": create_reminders_for_catalogue(conn, lid, uname, dt.date.fromisoformat(cdate), lead["catalogue_attempts"])
             elif fdate: conn.execute(text("INSERT INTO reminders (lead_id, reminder_date, reminder_type, user_name) VALUES (:lid, :rdate, :rtype, :user)"), {"lid": lid, "rdate": fdate, "rtype": remark, "user": uname})
-            conn.execute(text("UPDATE leads SET current_status=:s, last_call_date=:d, no_response_attempts=:nr, catalogue_attempts=:ca, is_active=:a, assigned_user=:au WHERE id=:id"), {"s": remark, "d": cdate, "nr": no_resp, "ca": cat_att, "a": active, "au": assign or lead["assigned_user"], "id": lid})
             return "✓ Call saved successfully!"
     
-    return _save()
+    result = _save()
+    invalidate_leads_cache()
+    return result
 
 # ---------------- FOLLOWUPS CALLBACKS ----------------
 
@@ -877,8 +1180,8 @@ def update_followups(n_done, start_date, end_date, n_all, rows, data, remark, us
         params["start"] = start_date
         params["end"] = end_date
     with READ_ENGINE.begin() as conn:
-        df = pd.read_sql(text(query), conn, params=params)
-    return df.to_dict("records"), status_msg
+        records = read_records(conn, query, params)
+    return records, status_msg
 
 # ---------------- REPORTS CALLBACKS ----------------
 
@@ -890,25 +1193,43 @@ def update_followups(n_done, start_date, end_date, n_all, rows, data, remark, us
 )
 def update_reports(start_date, end_date, n_clicks):
     try:
-        query = "SELECT cl.*, l.database_name FROM call_logs cl LEFT JOIN leads l ON cl.lead_id = l.id"
+        where_sql = ""
         params = {}
         if start_date and end_date:
-            query += " WHERE cl.call_date BETWEEN :start AND :end"
+            where_sql = "WHERE call_date BETWEEN :start AND :end"
             params["start"] = start_date + " 00:00:00"
             params["end"] = end_date + " 23:59:59"
-        with READ_ENGINE.begin() as conn:
-            calls_df = pd.read_sql(text(query), conn, params=params)
-        if calls_df.empty: return dbc.Alert("No call logs found.", color="warning")
-        calls_df["call_date"] = pd.to_datetime(calls_df["call_date"], errors="coerce")
-        trend_df = calls_df.groupby(calls_df["call_date"].dt.date).size().reset_index(name="calls")
+        # Let SQLite aggregate so only one row per day/outcome comes back
+        with HEAVY_READ_ENGINE.begin() as conn:
+            outcome_df = read_df(conn, f"SELECT outcome, COUNT(*) AS count FROM call_logs {where_sql} GROUP BY outcome HAVING outcome IS NOT NULL ORDER BY count DESC", params)
+            trend_df = read_df(conn, f"SELECT date(call_date) AS call_date, COUNT(*) AS calls FROM call_logs {where_sql} GROUP BY 1 HAVING date(call_date) IS NOT NULL ORDER BY 1", params)
+        if outcome_df.empty and trend_df.empty: return dbc.Alert("No call logs found.", color="warning")
         fig_trend = px.line(trend_df, x="call_date", y="calls", title="Calls Trend")
-        outcome_df = calls_df["outcome"].value_counts().reset_index()
         fig_pie = px.pie(outcome_df, names="outcome", values="count", title="Outcome Distribution")
         return dbc.Row([dbc.Col(dcc.Graph(figure=fig_trend), width=6), dbc.Col(dcc.Graph(figure=fig_pie), width=6)])
     except Exception as e: return dbc.Alert(f"Error: {e}", color="danger")
 
 # ---------------- ADMIN CALLBACKS ----------------
 
+def detect_excel_header_row(decoded, max_rows=3):
+    """Index of the first of the top rows that looks like a lead header, 0 if none do
+
+    Scans the raw cells with a read-only openpyxl workbook so the sheet is only parsed by pandas once.
+    """
+    try:
+        wb = openpyxl.load_workbook(io.BytesIO(decoded), read_only=True, data_only=True)
+    except Exception:
+        return 0
+    try:
+        # pd.read_excel parses the first sheet, not whichever one was active when the file was saved
+        for i, row in enumerate(wb.worksheets[0].iter_rows(max_row=max_rows, values_only=True)):
+            cells = [str(c).lower().strip() for c in row if c is not None]
+            if any('name' in c or 'customer' in c or 'phone' in c or 'mobile' in c for c in cells):
+                return i
+        return 0
+    finally:
+        wb.close()
+
 @app.callback(Output("upload-status", "children"), Input("upload-excel", "contents"), State("upload-excel", "filename"), prevent_initial_call=True)
 def handle_upload(contents, filename):
     if not contents: return no_update
@@ -916,19 +1237,7 @@ def handle_upload(contents, filename):
         content_type, content_string = contents.split(",")
         decoded = base64.b64decode(content_string)
         
-        df = None
-        for header_row in [0, 1, 2]:
-            try:
-                test_df = pd.read_excel(io.BytesIO(decoded), header=header_row)
-                cols_lower = [str(c).lower().strip() for c in test_df.columns]
-                if any('name' in c or 'customer' in c or 'phone' in c or 'mobile' in c for c in cols_lower):
-                    df = test_df
-                    break
-            except:
-                continue
-        
-        if df is None:
-            df = pd.read_excel(io.BytesIO(decoded))
+        df = pd.read_excel(io.BytesIO(decoded), header=detect_excel_header_row(decoded))
         
         insert_or_update_leads_from_df(df)
         return dbc.Alert(f"✓ Successfully imported {len(df)} rows from {filename}", color="success")
@@ -939,26 +1248,39 @@ def handle_upload(contents, filename):
 def import_gsheet(n, url):
     if not url: return "Enter URL."
     try:
-        resp = requests.get(url)
-        df = pd.read_csv(io.StringIO(resp.text))
-        insert_or_update_leads_from_df(df)
-        return f"Imported {len(df)} rows."
-    except Exception as e: return f"Error: {e}"
+        total = 0
+        # Parse straight off the socket in chunks so the whole sheet is never held in memory at once
+        with requests.get(url, stream=True) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            for chunk in pd.read_csv(resp.raw, chunksize=IMPORT_CHUNK_ROWS):
+                insert_or_update_leads_from_df(chunk)
+                total += len(chunk)
+        return f"Imported {total} rows."
+    # Each chunk commits on its own, so say how much already landed before re-running the import
+    except Exception as e: return f"Error after importing {total} rows: {e}"
+
+# Only a switch *to* the admin tab reaches the server; other tab clicks are dropped in the browser
+app.clientside_callback(
+    """function(tab) { return tab === "tab-admin" ? Date.now() : window.dash_clientside.no_update; }""",
+    Output("admin-tab-opened", "data"),
+    Input("tabs", "value"),
+)
 
 @app.callback(
     Output("templates-table", "data"),
     Output("template-action-status", "children"),
     Input("update-template-btn", "n_clicks"),
     Input("delete-template-btn", "n_clicks"),
-    Input("tabs", "value"),
+    Input("admin-tab-opened", "data"),
     State("templates-table", "selected_rows"),
     State("templates-table", "data"),
     State("template-edit-title", "value"),
     State("template-edit-text", "value"),
     State("current-user", "data")
 )
-def manage_templates(u_n, d_n, active_tab, rows, data, title, text_val, user):
-    if not user or active_tab != "tab-admin":
+def manage_templates(u_n, d_n, admin_tab_opened, rows, data, title, text_val, user):
+    if not user or not admin_tab_opened:
         return no_update, no_update
 
     uname = cu_username(user)
@@ -979,9 +1301,9 @@ def manage_templates(u_n, d_n, active_tab, rows, data, title, text_val, user):
                 elif triggered == "delete-template-btn" and tid:
                     conn.execute(text("DELETE FROM pitch_templates WHERE id=:id"), {"id": tid})
                     status = "Template deleted."
+                _pitch_templates_cache["t"] = 0
 
-            df = pd.read_sql("SELECT id, title, created_at, pitch_text FROM pitch_templates WHERE user_name = :u", conn, params={"u": uname})
-            return df.to_dict("records"), status
+            return read_records(conn, "SELECT id, title, created_at, pitch_text FROM pitch_templates WHERE user_name = :u", {"u": uname}), status
     except Exception as e:
         return no_update, f"Error: {str(e)}"
 
@@ -991,7 +1313,7 @@ def manage_templates(u_n, d_n, active_tab, rows, data, title, text_val, user):
     Input("add-user-button", "n_clicks"),
     Input("activate-user-button", "n_clicks"),
     Input("deactivate-user-button", "n_clicks"),
-    Input("tabs", "value"),
+    Input("admin-tab-opened", "data"),
     State("new-user-username", "value"),
     State("new-user-password", "value"),
     State("new-user-email", "value"),
@@ -999,28 +1321,29 @@ def manage_templates(u_n, d_n, active_tab, rows, data, title, text_val, user):
     State("users-table", "data"),
     State("current-user", "data")
 )
-def manage_users(a, act, de, active_tab, u, p, e, rows, data, admin):
-    if not admin or active_tab != "tab-admin" or not is_admin(cu_username(admin)):
+def manage_users(a, act, de, admin_tab_opened, u, p, e, rows, data, admin):
+    if not admin or not admin_tab_opened or not is_admin(cu_username(admin)):
         return no_update, no_update
 
     triggered = ctx.triggered_id
     status = ""
 
     try:
+        # Hash before opening the write transaction so the lock isn't held during key stretching
+        hashed = hash_password(p) if triggered == "add-user-button" and u and p else None
         with WRITE_ENGINE.begin() as conn:
             if triggered in ["add-user-button", "activate-user-button", "deactivate-user-button"]:
                 tid = data[rows[0]]["id"] if rows and data and rows[0] < len(data) else None
                 if triggered == "add-user-button" and u and p:
-                    hashed = bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
                     conn.execute(text("INSERT INTO users (username, password, email, role) VALUES (:u, :p, :e, 'user')"), {"u": u, "p": hashed, "e": e})
                     status = "User added."
                 elif tid and triggered in ["activate-user-button", "deactivate-user-button"]:
                     is_active = 1 if triggered == "activate-user-button" else 0
                     conn.execute(text("UPDATE users SET is_active = :a WHERE id = :id"), {"a": is_active, "id": tid})
                     status = "User status updated."
+                _user_role.cache_clear()
 
-            df = pd.read_sql("SELECT id, username, role, is_active, email FROM users", conn)
-            return df.to_dict("records"), status
+            return read_records(conn, "SELECT id, username, role, is_active, email FROM users"), status
     except Exception as e:
         return no_update, f"Error: {str(e)}"
 
@@ -1031,9 +1354,26 @@ def manage_users(a, act, de, active_tab, u, p, e, rows, data, admin):
 )
 def download_data_view(n):
     if not n: return no_update
-    with READ_ENGINE.begin() as conn: df = pd.read_sql("SELECT * FROM leads", conn)
     out = io.BytesIO()
-    with pd.ExcelWriter(out, engine="xlsxwriter") as writer: df.to_excel(writer, index=False, sheet_name="Leads")
+    # constant_memory flushes a row once the next one is started, so cells must be written row by row
+    # (pandas' to_excel writes column by column and would silently drop data in this mode)
+    workbook = xlsxwriter.Workbook(out, {"constant_memory": True, "strings_to_urls": False})
+    try:
+        sheet = workbook.add_worksheet("Leads")
+        with HEAVY_READ_ENGINE.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text("SELECT * FROM leads"))
+            sheet.write_row(0, 0, list(result.keys()))
+            r = 1
+            for chunk in result.partitions(EXPORT_CHUNK_ROWS):
+                for row in chunk:
+                    # xlsxwriter can't write legacy BLOB cells, convert them like the Data View does
+                    if any(isinstance(v, (bytes, bytearray)) for v in row):
+                        row = [int.from_bytes(v, byteorder="little") if isinstance(v, (bytes, bytearray)) else v for v in row]
+                    sheet.write_row(r, 0, row)
+                    r += 1
+    finally:
+        # Also removes constant_memory's temp files when the export fails part way
+        workbook.close()
     return dcc.send_bytes(out.getvalue(), "leads_export.xlsx")
 
 @app.callback(
@@ -1060,15 +1400,14 @@ def delete_all_leads_data(n, confirm_key, user):
             with WRITE_ENGINE.begin() as conn:
                 result_reminders = conn.execute(text("DELETE FROM reminders"))
                 result_logs = conn.execute(text("DELETE FROM call_logs"))
-                result_leads = conn.execute(text("DELETE FROM leads"))
+                leads_deleted = clear_all_leads(conn)
                 
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='leads'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='call_logs'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='reminders'"))
+                conn.execute(text("DELETE FROM sqlite_sequence WHERE name IN ('leads', 'call_logs', 'reminders')"))
 
-                return result_leads.rowcount, result_logs.rowcount, result_reminders.rowcount
+                return leads_deleted, result_logs.rowcount, result_reminders.rowcount
 
         leads_deleted, logs_deleted, reminders_deleted = _delete()
+        invalidate_leads_cache()
         return dbc.Alert(
             f"Successfully deleted: {leads_deleted} leads, {logs_deleted} call logs, {reminders_deleted} reminders. ID counters reset. Users and templates preserved.",
             color="success"
@@ -1087,33 +1426,36 @@ def master_reset_database(n, reset_key, user):
     if not n or not user:
         return no_update
 
+    # Cheap key check first so a wrong key never costs a users lookup
+    if not reset_key_matches(reset_key):
+        return dbc.Alert("Incorrect master reset key.", color="danger")
+
     uname = cu_username(user)
     if not is_admin(uname):
         return dbc.Alert("Only admins can perform master reset.", color="danger")
 
-    if reset_key != MASTER_RESET_KEY:
-        return dbc.Alert("Incorrect master reset key.", color="danger")
-
     try:
+        hashed = default_admin_hash()
+
         @with_write_retry
         def _master_reset():
             with WRITE_ENGINE.begin() as conn:
+                # Emptying the child tables outright is cheaper than letting the cascade visit them row by row
                 conn.execute(text("DELETE FROM reminders"))
                 conn.execute(text("DELETE FROM call_logs"))
-                conn.execute(text("DELETE FROM leads"))
+                clear_all_leads(conn)
                 conn.execute(text("DELETE FROM pitch_templates"))
                 conn.execute(text("DELETE FROM users"))
                 
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='leads'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='call_logs'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='reminders'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='pitch_templates'"))
-                conn.execute(text("DELETE FROM sqlite_sequence WHERE name='users'"))
+                # Every AUTOINCREMENT table is being emptied, so every counter goes
+                conn.execute(text("DELETE FROM sqlite_sequence"))
 
-                hashed = bcrypt.hashpw("naved123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
                 conn.execute(text("INSERT INTO users (username, password, is_active, role) VALUES ('naved', :p, 1, 'admin')"), {"p": hashed})
 
         _master_reset()
+        _user_role.cache_clear()
+        _pitch_templates_cache["t"] = 0
+        invalidate_leads_cache()
         return dbc.Alert("Master reset complete! All data deleted and ID counters reset. Default admin restored (username: naved, password: naved123). Please refresh the page.", color="success")
     except Exception as e:
         return dbc.Alert(f"Error during master reset: {str(e)}", color="danger")